@@ -2,6 +2,7 @@ import argparse
 import logging
 import os.path
 
+from cache import EngineCache
 from dataset import *
 from engine import *
 
@@ -83,9 +84,9 @@ def save(file_name, results):
         json.dump(results, f)
 
 
-def run(engine_name, dataset, search_phrases, access_key=None, bucket_name=None):
+def run(engine_name, dataset, search_phrases, access_key=None, bucket_name=None, cache=None):
     engine_handle = Engine.create(
-        Engines[engine_name], access_key=access_key, bucket_name=bucket_name)
+        Engines[engine_name], access_key=access_key, bucket_name=bucket_name, cache=cache)
     logging.info(f'created {str(engine_handle)} engine')
 
     results = dict()
@@ -154,6 +155,8 @@ def main():
     parser.add_argument('--dataset_folder', type=str, required=True)
     parser.add_argument('--access_key', type=str)
     parser.add_argument('--google_bucket_name', type=str)
+    parser.add_argument('--cache_folder', type=str, default=EngineCache.DEFAULT_FOLDER)
+    parser.add_argument('--cache_size_gb', type=float)
 
     args = parser.parse_args()
 
@@ -165,6 +168,10 @@ def main():
         print('Google Speech-to-Text engine requires a Google Storage bucket name to perform the tests')
         exit(1)
 
+    cache = EngineCache(
+        folder=args.cache_folder,
+        max_size_bytes=int(args.cache_size_gb * (1 << 30)) if args.cache_size_gb is not None else None)
+
     dataset = Dataset.create('tedlium', args.dataset_folder)
     logging.info(
         f'loaded {str(dataset)} with {dataset.size_hours():.2f} hours of data')
@@ -175,10 +182,13 @@ def main():
             dataset=dataset,
             search_phrases=SEARCH_PHRASES,
             access_key=args.access_key,
-            bucket_name=args.google_bucket_name
+            bucket_name=args.google_bucket_name,
+            cache=cache
         )
         save(file_name=f'{str(dataset)}-{engine}', results=results)
 
+    logging.info(f'{str(cache)} statistics : {cache.stats()}')
+
 
 if __name__ == '__main__':
     main()
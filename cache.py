@@ -0,0 +1,200 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+
+class EngineCache(object):
+    """
+    Content-addressed store for engine outputs. Entries are keyed by the SHA-256 of the audio content together with the
+    engine identity and its parameters, so that upgrading an engine or changing its configuration never reuses stale
+    results. Writes are atomic and guarded by file locks, so concurrent workers can share the same folder. The total
+    size is bounded by evicting the least recently used entries.
+    """
+
+    DEFAULT_FOLDER = os.path.join(os.path.dirname(__file__), 'resources', 'cache')
+
+    _TMP_PREFIX = '.tmp-'
+
+    def __init__(self, folder=DEFAULT_FOLDER, max_size_bytes=None):
+        self._folder = os.path.abspath(folder)
+        self._objects_folder = os.path.join(self._folder, 'objects')
+        self._locks_folder = os.path.join(self._folder, 'locks')
+        self._eviction_lock_path = os.path.join(self._folder, 'eviction.lock')
+        os.makedirs(self._objects_folder, exist_ok=True)
+        os.makedirs(self._locks_folder, exist_ok=True)
+
+        self._max_size_bytes = max_size_bytes
+
+        umask = os.umask(0)
+        os.umask(umask)
+        self._file_mode = 0o644 & ~umask
+
+        self._audio_digests = dict()
+        self._stats_lock = threading.Lock()
+        self._num_hits = 0
+        self._num_misses = 0
+        self._num_writes = 0
+        self._num_evictions = 0
+
+    def key(self, path, engine_identity, params=None):
+        identity = json.dumps(
+            {'engine': engine_identity, 'params': params if params is not None else dict()},
+            sort_keys=True,
+            default=str)
+
+        h = hashlib.sha256()
+        h.update(self.audio_digest(path).encode())
+        h.update(b'\0')
+        h.update(identity.encode())
+        return h.hexdigest()
+
+    def audio_digest(self, path):
+        stat = os.stat(path)
+        signature = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        digest = self._audio_digests.get(signature)
+        if digest is None:
+            digest = self.file_digest(path)
+            self._audio_digests[signature] = digest
+        return digest
+
+    @staticmethod
+    def file_digest(path, chunk_size=1 << 20):
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def get(self, key):
+        data = self._read(key)
+        self._count('_num_hits' if data is not None else '_num_misses')
+        return data
+
+    def put(self, key, data):
+        path = self._object_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=self._TMP_PREFIX)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp_path, self._file_mode)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self._count('_num_writes')
+        if self._max_size_bytes is not None:
+            self.evict()
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached entry for `key`, calling `compute()` to produce (and store) it on a miss. The per-key lock
+        ensures that concurrent workers asking for the same entry compute it only once.
+        """
+
+        data = self._read(key)
+        if data is None:
+            with self.lock(key):
+                data = self._read(key)
+                if data is None:
+                    self._count('_num_misses')
+                    data = compute()
+                    self.put(key, data)
+                    return data
+
+        self._count('_num_hits')
+        return data
+
+    @contextmanager
+    def lock(self, key):
+        with self._flock(os.path.join(self._locks_folder, f'{key[:2]}.lock')):
+            yield
+
+    def evict(self):
+        if self._max_size_bytes is None:
+            return
+
+        with self._flock(self._eviction_lock_path):
+            entries = sorted((stat.st_mtime, stat.st_size, path) for path, stat in self._entries())
+            total_size = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total_size <= self._max_size_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                total_size -= size
+                self._count('_num_evictions')
+                logging.debug(f"evicted '{path}' from {str(self)}")
+
+    def size_bytes(self):
+        return sum(stat.st_size for _, stat in self._entries())
+
+    def stats(self):
+        with self._stats_lock:
+            num_lookups = self._num_hits + self._num_misses
+            return {
+                'hits': self._num_hits,
+                'misses': self._num_misses,
+                'hit_rate': float(self._num_hits) / num_lookups if num_lookups > 0 else 0.,
+                'writes': self._num_writes,
+                'evictions': self._num_evictions,
+                'size_bytes': self.size_bytes(),
+                'max_size_bytes': self._max_size_bytes,
+            }
+
+    def _read(self, key):
+        path = self._object_path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def _entries(self):
+        for root, _, files in os.walk(self._objects_folder):
+            for file in files:
+                if file.startswith(self._TMP_PREFIX):
+                    continue
+                path = os.path.join(root, file)
+                try:
+                    yield path, os.stat(path)
+                except FileNotFoundError:
+                    continue
+
+    def _object_path(self, key):
+        return os.path.join(self._objects_folder, key[:2], key)
+
+    def _count(self, counter):
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    @staticmethod
+    @contextmanager
+    def _flock(path):
+        with open(path, 'a') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def __str__(self):
+        return f"EngineCache('{self._folder}')"
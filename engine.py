@@ -8,10 +8,13 @@ import pvoctopus
 import soundfile
 from deepspeech import Model
 from deepspeech import client
+from deepspeech import version as deep_speech_version
 from google.cloud import speech
 from google.cloud import storage
 from google.protobuf.json_format import MessageToDict
 
+from cache import EngineCache
+
 
 class Engines(Enum):
     MOZILLA_DEEP_SPEECH = 'MOZILLA_DEEP_SPEECH'
@@ -33,32 +36,45 @@ class Engine(object):
 
     @classmethod
     def create(cls, engine_type, **kwargs):
+        cache = kwargs.get('cache')
+        if cache is None:
+            cache = EngineCache()
+
         if engine_type is Engines.GOOGLE_SPEECH_TO_TEXT:
-            return GoogleSpeechToText(kwargs['bucket_name'])
+            return GoogleSpeechToText(kwargs['bucket_name'], cache)
         elif engine_type is Engines.MOZILLA_DEEP_SPEECH:
-            return MozillaDeepSpeech()
+            return MozillaDeepSpeech(cache)
         elif engine_type is Engines.PICOVOICE_OCTOPUS:
-            return PicovoiceOctopus(kwargs['access_key'])
+            return PicovoiceOctopus(kwargs['access_key'], cache)
         else:
             raise ValueError(f"cannot create {cls.__name__} of type 'engine_type'")
 
 
 class PicovoiceOctopus(Engine):
-    def __init__(self, access_key):
+    def __init__(self, access_key, cache):
         self._octopus = pvoctopus.create(
             access_key=access_key,
             library_path=pvoctopus.LIBRARY_PATH,
             model_path=pvoctopus.MODEL_PATH)
+        self._cache = cache
+        self._identity = {
+            'engine': Engines.PICOVOICE_OCTOPUS.value,
+            'version': self._octopus.version,
+            'model': EngineCache.file_digest(pvoctopus.MODEL_PATH),
+        }
+
+    def index(self, path, octopus=None):
+        if octopus is None:
+            octopus = self._octopus
+
+        key = self._cache.key(path, self._identity)
+        data = self._cache.get_or_compute(
+            key,
+            lambda: octopus.index_audio_file(os.path.abspath(path)).to_bytes())
+        return pvoctopus.OctopusMetadata.from_bytes(data)
 
     def search(self, path, search_phrase, confidence_threshold=0.8):
-        cache_path = path.replace('.wav', '.oif')
-        if os.path.exists(cache_path):
-            with open(cache_path, 'rb') as f:
-                metadata = pvoctopus.OctopusMetadata.from_bytes(f.read())
-        else:
-            metadata = self._octopus.index_audio_file(os.path.abspath(path))
-            with open(cache_path, 'wb') as f:
-                f.write(metadata.to_bytes())
+        metadata = self.index(path)
 
         matches = self._octopus.search(metadata, [search_phrase])
         matches_list = list()
@@ -82,33 +98,34 @@ class PicovoiceOctopus(Engine):
 
 
 class GoogleSpeechToText(Engine):
-    def __init__(self, bucket_name):
+    def __init__(self, bucket_name, cache):
         self._client = speech.SpeechClient()
         self._bucket_name = bucket_name
+        self._cache = cache
+        self._config = speech.RecognitionConfig(
+            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+            sample_rate_hertz=16000,
+            language_code='en-US',
+            enable_word_time_offsets=True,
+        )
+        self._identity = {
+            'engine': Engines.GOOGLE_SPEECH_TO_TEXT.value,
+            'api': 'v1',
+        }
+
+    def _transcribe(self, path):
+        self.upload_audio_to_storage(self._bucket_name, path, os.path.basename(path))
+        audio = speech.RecognitionAudio(uri=f'gs://{self._bucket_name}/{os.path.basename(path)}')
+
+        operation = self._client.long_running_recognize(config=self._config, audio=audio)
+        print("Waiting for operation to complete...")
+        response = operation.result(timeout=600)
+        return json.dumps(MessageToDict(response._pb)).encode()
 
     def search(self, path, search_phrase, confidence_threshold=0.8):
-        cache_path = path.replace('.wav', '.ggl')
-        if os.path.exists(cache_path):
-            with open(cache_path) as f:
-                response_dict = json.load(f)
-                transcripts = response_dict['results']
-        else:
-            self.upload_audio_to_storage(self._bucket_name, path, os.path.basename(path))
-            audio = speech.RecognitionAudio(uri=f'gs://{self._bucket_name}/{os.path.basename(path)}')
-            config = speech.RecognitionConfig(
-                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-                sample_rate_hertz=16000,
-                language_code='en-US',
-                enable_word_time_offsets=True,
-            )
-
-            operation = self._client.long_running_recognize(config=config, audio=audio)
-            print("Waiting for operation to complete...")
-            response = operation.result(timeout=600)
-            response_dict = MessageToDict(response._pb)
-            transcripts = response_dict['results']
-            with open(cache_path, 'w') as f:
-                json.dump(response_dict, f)
+        key = self._cache.key(path, self._identity, MessageToDict(self._config._pb))
+        response_dict = json.loads(self._cache.get_or_compute(key, lambda: self._transcribe(path)))
+        transcripts = response_dict['results']
 
         matches = list()
 
@@ -144,29 +161,31 @@ class GoogleSpeechToText(Engine):
 
 
 class MozillaDeepSpeech(Engine):
-    def __init__(self):
+    def __init__(self, cache):
         deep_speech_folder = os.path.join(os.path.dirname(__file__), 'resources', 'engines', 'deep_speech')
         acoustic_model = os.path.join(deep_speech_folder, 'deepspeech-0.9.3-models.pbmm')
         language_model = os.path.join(deep_speech_folder, 'deepspeech-0.9.3-models.scorer')
 
         self._model = Model(acoustic_model)
         self._model.enableExternalScorer(language_model)
+        self._cache = cache
+        self._identity = {
+            'engine': Engines.MOZILLA_DEEP_SPEECH.value,
+            'version': deep_speech_version(),
+            'acoustic_model': EngineCache.file_digest(acoustic_model),
+            'language_model': EngineCache.file_digest(language_model),
+        }
+
+    def _transcribe(self, path):
+        pcm, sample_rate = soundfile.read(path)
+        pcm = (np.iinfo(np.int16).max * pcm).astype(np.int16)
+        transcript_with_metadata = self._model.sttWithMetadata(pcm)
+        return client.metadata_json_output(transcript_with_metadata).encode()
 
     def search(self, path, search_phrase, confidence_threshold):
-        cache_path = path.replace('.wav', '.mdp')
-        if os.path.exists(cache_path):
-            with open(cache_path) as f:
-                response_dict = json.load(f)
-                words = response_dict['transcripts'][0]['words']
-
-        else:
-            pcm, sample_rate = soundfile.read(path)
-            pcm = (np.iinfo(np.int16).max * pcm).astype(np.int16)
-            transcript_with_metadata = self._model.sttWithMetadata(pcm)
-            response_dict = json.loads(client.metadata_json_output(transcript_with_metadata))
-            words = response_dict['transcripts'][0]['words']
-            with open(cache_path, 'w') as f:
-                json.dump(response_dict, f)
+        key = self._cache.key(path, self._identity, {'beam_width': self._model.beamWidth()})
+        response_dict = json.loads(self._cache.get_or_compute(key, lambda: self._transcribe(path)))
+        words = response_dict['transcripts'][0]['words']
 
         matches = list()
         for word in words:
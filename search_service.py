@@ -0,0 +1,311 @@
+import argparse
+import json
+import logging
+import math
+import os
+import socketserver
+import stat
+import threading
+from collections import deque
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from time import perf_counter
+from urllib.parse import parse_qs
+from urllib.parse import urlparse
+
+from cache import EngineCache
+from dataset import *
+from engine import *
+
+logging.basicConfig(format='%(asctime)s:%(levelname)s:%(message)s', level=logging.INFO)
+
+
+class SearchBackend(object):
+    Match = namedtuple('Match', ['start_sec', 'end_sec', 'probability'])
+
+    def load(self, path, captions):
+        raise NotImplementedError()
+
+    def search(self, index, search_phrase):
+        raise NotImplementedError()
+
+    def delete(self):
+        raise NotImplementedError()
+
+    def __str__(self):
+        raise NotImplementedError()
+
+
+class OctopusSearchBackend(SearchBackend):
+    """
+    Searches `OctopusMetadata` indexes. Each worker thread gets its own Octopus handle so that queries fanned out across
+    the thread pool do not contend on a single instance.
+    """
+
+    def __init__(self, access_key, cache):
+        self._access_key = access_key
+        self._indexer = Engine.create(Engines.PICOVOICE_OCTOPUS, access_key=access_key, cache=cache)
+        self._local = threading.local()
+        self._handles = list()
+        self._handles_lock = threading.Lock()
+
+    def load(self, path, captions):
+        return self._indexer.index(path, octopus=self._handle())
+
+    def search(self, index, search_phrase):
+        matches = self._handle().search(index, [search_phrase])
+        if len(matches) == 0:
+            return list()
+
+        return [self.Match(
+            start_sec=result.start_sec,
+            end_sec=result.end_sec,
+            probability=result.probability
+        ) for result in matches[str(search_phrase)]]
+
+    def _handle(self):
+        handle = getattr(self._local, 'octopus', None)
+        if handle is None:
+            handle = pvoctopus.create(
+                access_key=self._access_key,
+                library_path=pvoctopus.LIBRARY_PATH,
+                model_path=pvoctopus.MODEL_PATH)
+            self._local.octopus = handle
+            with self._handles_lock:
+                self._handles.append(handle)
+        return handle
+
+    def delete(self):
+        with self._handles_lock:
+            for handle in self._handles:
+                handle.delete()
+            self._handles.clear()
+        self._indexer.delete()
+
+    def __str__(self):
+        return 'Picovoice Octopus'
+
+
+class TranscriptSearchBackend(SearchBackend):
+    """
+    Local stand-in for Octopus that searches the reference transcripts of the dataset. It needs no AccessKey and returns
+    caption boundaries with a probability of one, which is enough to exercise the service end-to-end.
+    """
+
+    def load(self, path, captions):
+        return [(caption, caption.content.lower().split()) for caption in captions]
+
+    def search(self, index, search_phrase):
+        phrase_words = search_phrase.lower().split()
+        if len(phrase_words) == 0:
+            return list()
+
+        matches = list()
+        for caption, words in index:
+            for i in range(len(words) - len(phrase_words) + 1):
+                if words[i:i + len(phrase_words)] == phrase_words:
+                    matches.append(self.Match(start_sec=caption.start_sec, end_sec=caption.end_sec, probability=1.))
+        return matches
+
+    def delete(self):
+        pass
+
+    def __str__(self):
+        return 'Reference Transcripts'
+
+
+class SearchService(object):
+    """
+    Long-lived corpus-wide search. Every talk of the dataset is indexed (or loaded from the cache) once at start-up and
+    each query is fanned out across all of them on a thread pool. Hits are ranked globally by probability.
+    """
+
+    Hit = namedtuple('Hit', ['talk', 'start_sec', 'end_sec', 'probability'])
+
+    def __init__(self, backend, dataset, num_threads=None, num_latency_samples=10000):
+        self._backend = backend
+        self._executor = ThreadPoolExecutor(max_workers=num_threads)
+
+        def load(index):
+            path, captions = dataset.get(index)
+            return os.path.splitext(os.path.basename(path))[0], self._backend.load(path, captions)
+
+        start_sec = perf_counter()
+        self._indexes = list(self._executor.map(load, range(dataset.size())))
+        logging.info(f'loaded {len(self._indexes)} {str(backend)} indexes in {perf_counter() - start_sec:.2f} seconds')
+
+        self._latencies_sec = deque(maxlen=num_latency_samples)
+        self._num_queries = 0
+        self._metrics_lock = threading.Lock()
+
+    def search(self, search_phrase, confidence_threshold=0., limit=None):
+        start_sec = perf_counter()
+
+        def search_talk(talk_index):
+            talk, index = talk_index
+            return [self.Hit(
+                talk=talk,
+                start_sec=match.start_sec,
+                end_sec=match.end_sec,
+                probability=match.probability
+            ) for match in self._backend.search(index, search_phrase) if match.probability >= confidence_threshold]
+
+        hits = list()
+        for talk_hits in self._executor.map(search_talk, self._indexes):
+            hits.extend(talk_hits)
+        hits.sort(key=lambda x: (-x.probability, x.talk, x.start_sec))
+        if limit is not None:
+            hits = hits[:limit]
+
+        latency_sec = perf_counter() - start_sec
+        with self._metrics_lock:
+            self._latencies_sec.append(latency_sec)
+            self._num_queries += 1
+
+        return hits
+
+    def metrics(self):
+        with self._metrics_lock:
+            latencies_sec = sorted(self._latencies_sec)
+            num_queries = self._num_queries
+
+        def percentile(p):
+            if len(latencies_sec) == 0:
+                return 0.
+            return 1000 * latencies_sec[min(len(latencies_sec) - 1, int(p * len(latencies_sec)))]
+
+        return {
+            'num_talks': len(self._indexes),
+            'num_queries': num_queries,
+            'mean_latency_ms': 1000 * sum(latencies_sec) / len(latencies_sec) if len(latencies_sec) > 0 else 0.,
+            'p50_latency_ms': percentile(0.5),
+            'p95_latency_ms': percentile(0.95),
+            'p99_latency_ms': percentile(0.99),
+            'max_latency_ms': 1000 * latencies_sec[-1] if len(latencies_sec) > 0 else 0.,
+        }
+
+    def delete(self):
+        self._executor.shutdown()
+        self._backend.delete()
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def remove_unix_socket(path):
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+
+    if not stat.S_ISSOCK(mode):
+        raise ValueError(f"'{path}' exists and is not a socket")
+    os.remove(path)
+
+
+def create_server(service, host='127.0.0.1', port=8000, unix_socket=None):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+
+            if url.path == '/search':
+                if 'phrase' not in params:
+                    self._send(400, {'error': "missing 'phrase' parameter"})
+                    return
+                try:
+                    threshold = float(params.get('threshold', ['0'])[0])
+                    limit = int(params['limit'][0]) if 'limit' in params else None
+                except ValueError as e:
+                    self._send(400, {'error': str(e)})
+                    return
+                if not math.isfinite(threshold):
+                    self._send(400, {'error': f"invalid 'threshold' `{threshold}`"})
+                    return
+                if limit is not None and limit < 0:
+                    self._send(400, {'error': f"invalid 'limit' `{limit}`"})
+                    return
+
+                try:
+                    hits = service.search(params['phrase'][0], confidence_threshold=threshold, limit=limit)
+                except (pvoctopus.OctopusError, ValueError) as e:
+                    self._send(400, {'error': str(e)})
+                    return
+                except Exception as e:
+                    logging.exception(f"failed to search for '{params['phrase'][0]}'")
+                    self._send(500, {'error': str(e)})
+                    return
+                self._send(200, {'hits': [hit._asdict() for hit in hits]})
+            elif url.path == '/metrics':
+                self._send(200, service.metrics())
+            else:
+                self._send(404, {'error': f"unknown path '{url.path}'"})
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def address_string(self):
+            return unix_socket if unix_socket is not None else super().address_string()
+
+    if unix_socket is not None:
+        remove_unix_socket(unix_socket)
+        return ThreadingUnixHTTPServer(unix_socket, Handler)
+    else:
+        return ThreadingHTTPServer((host, port), Handler)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dataset_folder', type=str, required=True)
+    parser.add_argument('--access_key', type=str)
+    parser.add_argument('--num_threads', type=int, default=os.cpu_count())
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--unix_socket', type=str)
+    parser.add_argument('--cache_folder', type=str, default=EngineCache.DEFAULT_FOLDER)
+
+    args = parser.parse_args()
+
+    if args.unix_socket is not None:
+        try:
+            remove_unix_socket(args.unix_socket)
+        except ValueError as e:
+            print(e)
+            exit(1)
+
+    if args.access_key is not None:
+        backend = OctopusSearchBackend(args.access_key, EngineCache(folder=args.cache_folder))
+    else:
+        logging.warning('no AccessKey is provided, searching reference transcripts instead of Picovoice Octopus')
+        backend = TranscriptSearchBackend()
+
+    dataset = Dataset.create('tedlium', args.dataset_folder)
+    service = SearchService(backend, dataset, num_threads=args.num_threads)
+
+    server = create_server(service, host=args.host, port=args.port, unix_socket=args.unix_socket)
+    if args.unix_socket is not None:
+        logging.info(f"serving {str(dataset)} search on '{args.unix_socket}'")
+    else:
+        logging.info(f'serving {str(dataset)} search on http://{args.host}:{args.port}')
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.delete()
+        if args.unix_socket is not None:
+            remove_unix_socket(args.unix_socket)
+
+
+if __name__ == '__main__':
+    main()